@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Note
+from .models import DeletionJob, Note
 
 admin.site.register(Note)
+admin.site.register(DeletionJob)
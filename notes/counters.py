@@ -0,0 +1,32 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Note, SharedNote, UserNoteStats
+
+
+@receiver(post_save, sender=Note)
+def count_created_note(sender, instance, created, **kwargs):
+    if created:
+        UserNoteStats.objects.increment(instance.user_id, "notes_owned")
+
+
+@receiver(post_delete, sender=Note)
+def count_deleted_note(sender, instance, **kwargs):
+    UserNoteStats.objects.decrement(instance.user_id, "notes_owned")
+
+
+@receiver(post_save, sender=SharedNote)
+def count_created_share(sender, instance, created, **kwargs):
+    if created:
+        UserNoteStats.objects.increment(instance.recipient_id, "notes_shared_with_me")
+        Note.objects.filter(pk=instance.note_id).update(
+            recipient_count=F("recipient_count") + 1
+        )
+
+
+@receiver(post_delete, sender=SharedNote)
+def count_deleted_share(sender, instance, **kwargs):
+    UserNoteStats.objects.decrement(instance.recipient_id, "notes_shared_with_me")
+    Note.objects.filter(pk=instance.note_id, recipient_count__gte=1).update(
+        recipient_count=F("recipient_count") - 1
+    )
@@ -0,0 +1,156 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import (
+    DeletionJob,
+    Note,
+    NoteRevision,
+    NoteTag,
+    SharedNote,
+    Tag,
+    UserNoteStats,
+)
+
+
+def batches(queryset, batch_size):
+    """
+    Yield lists of at most ``batch_size`` primary keys from ``queryset`` until it
+    is empty. Each batch must be deleted before the next one is requested.
+    """
+
+    while True:
+        pks = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return
+        yield pks
+
+
+def delete_note(note):
+    """
+    Delete a note and its shares with set-based statements instead of letting
+    the collector load every share into memory.
+    """
+
+    with transaction.atomic():
+        SharedNote.objects.revoke(note.pk)
+        revisions = NoteRevision.objects.filter(note_id=note.pk)
+        revisions._raw_delete(revisions.db)
+        note_tags = NoteTag.objects.filter(note_id=note.pk)
+        note_tags._raw_delete(note_tags.db)
+        notes = Note.objects.filter(pk=note.pk)
+        # A concurrent delete may have removed the note already.
+        if notes._raw_delete(notes.db):
+            UserNoteStats.objects.decrement(note.user_id, "notes_owned")
+
+
+def delete_user(user_id, batch_size):
+    """
+    Delete a user, removing the shares they received, then the shares,
+    revisions and tags of their notes, then their notes and tags, ``batch_size``
+    rows per transaction, and finally the user row itself.
+    """
+
+    received = SharedNote.objects.filter(recipient_id=user_id)
+    for pks in batches(received, batch_size):
+        with transaction.atomic():
+            shares = SharedNote.objects.filter(pk__in=pks)
+            Note.objects.filter(
+                pk__in=shares.values("note_id"), recipient_count__gte=1
+            ).update(recipient_count=F("recipient_count") - 1)
+            shares._raw_delete(shares.db)
+
+    sent = SharedNote.objects.filter(note__user_id=user_id)
+    for pks in batches(sent, batch_size):
+        with transaction.atomic():
+            shares = SharedNote.objects.filter(pk__in=pks)
+            # A recipient can hold several of the user's notes in one batch.
+            lost = (
+                shares.filter(recipient_id=OuterRef("user_id"))
+                .values("recipient_id")
+                .annotate(lost=Count("pk"))
+                .values("lost")
+            )
+            UserNoteStats.objects.filter(
+                user_id__in=shares.values("recipient_id")
+            ).update(
+                notes_shared_with_me=Greatest(
+                    F("notes_shared_with_me") - Subquery(lost), 0
+                )
+            )
+            shares._raw_delete(shares.db)
+
+    revisions = NoteRevision.objects.filter(note__user_id=user_id)
+    for pks in batches(revisions, batch_size):
+        with transaction.atomic():
+            batch = NoteRevision.objects.filter(pk__in=pks)
+            batch._raw_delete(batch.db)
+
+    note_tags = NoteTag.objects.filter(user_id=user_id)
+    for pks in batches(note_tags, batch_size):
+        with transaction.atomic():
+            batch = NoteTag.objects.filter(pk__in=pks)
+            batch._raw_delete(batch.db)
+
+    notes = Note.objects.filter(user_id=user_id)
+    for pks in batches(notes, batch_size):
+        with transaction.atomic():
+            batch = Note.objects.filter(pk__in=pks)
+            batch._raw_delete(batch.db)
+
+    tags = Tag.objects.filter(user_id=user_id)
+    for pks in batches(tags, batch_size):
+        with transaction.atomic():
+            batch = Tag.objects.filter(pk__in=pks)
+            batch._raw_delete(batch.db)
+
+    # Only small relations such as the token and the counters are left.
+    User.objects.filter(pk=user_id).delete()
+
+
+def claimable_jobs():
+    """
+    Return the jobs a worker may run: pending ones, failed ones to retry, and
+    running ones started more than ``DELETION_JOB_LEASE`` seconds ago, whose
+    worker is assumed to be gone. Deleting a user can be resumed at any point.
+    """
+
+    expired = timezone.now() - timedelta(seconds=settings.DELETION_JOB_LEASE)
+    return DeletionJob.objects.filter(
+        Q(status__in=[DeletionJob.PENDING, DeletionJob.FAILED])
+        | Q(status=DeletionJob.RUNNING, started_at__lt=expired)
+    )
+
+
+def run_deletion_job(job, batch_size):
+    """
+    Claim a job and run it, recording whether it succeeded. Returns False if
+    another worker claimed the job first.
+    """
+
+    started_at = timezone.now()
+    claimed = (
+        claimable_jobs()
+        .filter(pk=job.pk)
+        .update(status=DeletionJob.RUNNING, started_at=started_at)
+    )
+    if not claimed:
+        return False
+    job.started_at = started_at
+
+    try:
+        delete_user(job.target_user_id, batch_size)
+    except Exception as e:
+        job.status = DeletionJob.FAILED
+        job.error = str(e)
+    else:
+        job.status = DeletionJob.DONE
+        job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at"])
+    return True
@@ -0,0 +1,106 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.models import NoteRevision
+from notes.revisions import previous_revision_delta, reconstruct
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure revision storage per edit and the time to rebuild a version, "
+        "on a simulated long note. Runs in memory and does not touch the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, default=2000)
+        parser.add_argument("--revisions", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def edit(self, lines, rng):
+        # Typical edits touch a few lines: rewrite, insert or delete one
+        index = rng.randrange(len(lines))
+        action = rng.random()
+        if action < 0.6:
+            lines[index] = f"edited line {rng.random()}\n"
+        elif action < 0.8 or len(lines) < 2:
+            lines.insert(index, f"inserted line {rng.random()}\n")
+        else:
+            del lines[index]
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        lines = [
+            f"line {i} of a long note {rng.random()}\n" for i in range(options["lines"])
+        ]
+
+        content = "".join(lines)
+        revisions = [NoteRevision(number=1, is_snapshot=True, data=content)]
+        contents = [content]
+        encode_time = 0.0
+
+        for number in range(2, options["revisions"] + 1):
+            self.edit(lines, rng)
+            new_content = "".join(lines)
+
+            # The previous revision becomes a delta as in record_revision
+            start = time.perf_counter()
+            latest = revisions[-1]
+            delta = previous_revision_delta(latest, new_content)
+            if delta is not None:
+                latest.is_snapshot = False
+                latest.data = delta
+            revisions.append(
+                NoteRevision(number=number, is_snapshot=True, data=new_content)
+            )
+            encode_time += time.perf_counter() - start
+
+            contents.append(new_content)
+            content = new_content
+
+        deltas = [len(r.data) for r in revisions if not r.is_snapshot]
+        snapshots = [len(r.data) for r in revisions if r.is_snapshot]
+        total = sum(deltas) + sum(snapshots)
+        full_copies = sum(len(c) for c in contents)
+
+        # Rebuild every version from its nearest newer snapshot, as the endpoint does
+        worst = 0.0
+        start = time.perf_counter()
+        for index in range(len(revisions)):
+            snapshot = index
+            while not revisions[snapshot].is_snapshot:
+                snapshot += 1
+            begin = time.perf_counter()
+            rebuilt = reconstruct(
+                revisions[snapshot : index - 1 if index else None : -1]
+            )
+            worst = max(worst, time.perf_counter() - begin)
+            assert rebuilt == contents[index]
+        rebuild_time = time.perf_counter() - start
+
+        self.stdout.write(
+            f"Note size:            {len(content)} bytes, {len(lines)} lines"
+        )
+        self.stdout.write(f"Revisions:            {len(revisions)}")
+        self.stdout.write(
+            f"Snapshot interval:    {settings.REVISION_SNAPSHOT_INTERVAL}"
+        )
+        self.stdout.write(
+            f"Average delta:        {sum(deltas) / max(len(deltas), 1):.0f} bytes"
+        )
+        self.stdout.write(
+            f"Storage per edit:     {total / len(revisions):.0f} bytes "
+            f"(full copies: {full_copies / len(revisions):.0f} bytes)"
+        )
+        self.stdout.write(
+            f"Storage saved:        {100 * (1 - total / full_copies):.1f}%"
+        )
+        self.stdout.write(
+            f"Encode per edit:      {1000 * encode_time / len(revisions):.3f} ms"
+        )
+        self.stdout.write(
+            f"Rebuild per version:  {1000 * rebuild_time / len(revisions):.3f} ms "
+            f"(worst {1000 * worst:.3f} ms)"
+        )
@@ -0,0 +1,79 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Run in a fresh interpreter so every sample is a cold start. The request is
+# unauthenticated, so it goes through URL resolving, the view, authentication
+# and rendering without needing a database.
+PROBE = """
+import io, json, os, sys, time
+
+start = time.perf_counter()
+os.environ["DJANGO_SETTINGS_MODULE"] = sys.argv[1]
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+booted = time.perf_counter()
+
+environ = {
+    "REQUEST_METHOD": "GET",
+    "PATH_INFO": "/api/notes/created",
+    "SERVER_NAME": "localhost",
+    "SERVER_PORT": "80",
+    "wsgi.url_scheme": "http",
+    "wsgi.input": io.BytesIO(),
+    "wsgi.errors": sys.stderr,
+}
+statuses = []
+b"".join(application(environ, lambda status, headers: statuses.append(status)))
+responded = time.perf_counter()
+
+print(json.dumps({
+    "boot_ms": (booted - start) * 1000,
+    "first_response_ms": (responded - start) * 1000,
+    "modules": len(sys.modules),
+    "status": statuses[0],
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold start time (boot and time to first response) of the full "
+        "and the API-only settings, each in fresh interpreters."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=10)
+        parser.add_argument(
+            "--settings-modules",
+            nargs="+",
+            default=["notesapi.settings", "notesapi.settings_api"],
+        )
+
+    def probe(self, settings_module):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE, settings_module],
+            capture_output=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+            text=True,
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        for settings_module in options["settings_modules"]:
+            samples = [self.probe(settings_module) for _ in range(options["runs"])]
+            boot = statistics.median(s["boot_ms"] for s in samples)
+            first = statistics.median(s["first_response_ms"] for s in samples)
+
+            self.stdout.write(settings_module)
+            self.stdout.write(f"  Boot:            {boot:.1f} ms (median)")
+            self.stdout.write(f"  First response:  {first:.1f} ms (median)")
+            self.stdout.write(f"  Modules loaded:  {samples[0]['modules']}")
+            self.stdout.write(f"  Response status: {samples[0]['status']}")
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.deletion import claimable_jobs, run_deletion_job
+from notes.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the users queued for deletion, with their notes and shares, in "
+        "batches. Failed jobs and jobs left running by a stopped worker are retried."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.DELETION_BATCH_SIZE,
+            help="Number of rows removed per statement.",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="Queue this user id for deletion before running the jobs.",
+        )
+
+    def handle(self, *args, **options):
+        if options["user"] is not None:
+            DeletionJob.objects.get_or_create(
+                target_user_id=options["user"], status=DeletionJob.PENDING
+            )
+
+        for job in claimable_jobs().order_by("created_at"):
+            if not run_deletion_job(job, options["batch_size"]):
+                continue
+
+            if job.status == DeletionJob.DONE:
+                self.stdout.write(f"Deleted user {job.target_user_id}")
+            else:
+                self.stderr.write(
+                    f"Failed to delete user {job.target_user_id}: {job.error}"
+                )
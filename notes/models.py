@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 
 
@@ -7,16 +9,245 @@ class Note(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    recipient_count = models.PositiveIntegerField(default=0)
+    version = models.PositiveIntegerField(default=1)
+    tags = models.ManyToManyField(
+        "Tag", through="NoteTag", related_name="notes", blank=True
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-timestamp"])]
 
     def __str__(self):
         return self.title
 
 
+class SharedNoteManager(models.Manager):
+    def revoke(self, note_id, recipient_ids=None):
+        """
+        Remove the shares of a note, or only those of ``recipient_ids``, and
+        return how many were removed.
+
+        The shares are removed with a single ``DELETE`` and the counters are
+        adjusted with set-based ``UPDATE`` statements, so the number of queries
+        and of bound parameters does not depend on the number of recipients.
+        Per-row ``post_delete`` signals are not sent.
+        """
+
+        shares = self.filter(note_id=note_id)
+        if recipient_ids is not None:
+            shares = shares.filter(recipient_id__in=recipient_ids)
+
+        with transaction.atomic(using=self.db):
+            # Concurrent revokes of a note take turns on the note row, so a share
+            # is only counted by the revoke that deletes it. SQLite has no row
+            # locks, but it already serializes the writing transactions.
+            list(Note.objects.select_for_update().filter(pk=note_id).values("pk"))
+
+            # Each recipient has at most one share of a note, so every matching
+            # recipient loses exactly one shared note.
+            UserNoteStats.objects.decrement(
+                shares.values("recipient_id"), "notes_shared_with_me"
+            )
+            revoked = shares._raw_delete(shares.db)
+            if revoked:
+                Note.objects.filter(pk=note_id).update(
+                    recipient_count=Greatest(F("recipient_count") - revoked, 0)
+                )
+
+        return revoked
+
+
 class SharedNote(models.Model):
     note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name="shared_with")
     recipient = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="received_notes"
     )
+    # Copy of the note's timestamp, so a recipient's shared notes can be read
+    # newest first from the (recipient, -timestamp) index.
+    timestamp = models.DateTimeField()
+
+    objects = SharedNoteManager()
 
     class Meta:
         unique_together = ("note", "recipient")
+        indexes = [models.Index(fields=["recipient", "-timestamp"])]
+
+    def save(self, *args, **kwargs):
+        if self.timestamp is None:
+            self.timestamp = self.note.timestamp
+        super().save(*args, **kwargs)
+
+
+class UserNoteStatsManager(models.Manager):
+    def increment(self, user_id, field, amount=1):
+        """
+        Add ``amount`` to a counter of the given user, creating the row from the
+        actual counts if the user does not have one yet.
+        """
+
+        if self.filter(user_id=user_id).update(**{field: F(field) + amount}):
+            return
+
+        # The new row is counted from the tables, which already include the
+        # change being recorded.
+        try:
+            with transaction.atomic():
+                self.create(
+                    user_id=user_id,
+                    notes_owned=Note.objects.filter(user_id=user_id).count(),
+                    notes_shared_with_me=SharedNote.objects.filter(
+                        recipient_id=user_id
+                    ).count(),
+                )
+        except IntegrityError:
+            # Created concurrently, so the update will find it this time.
+            self.filter(user_id=user_id).update(**{field: F(field) + amount})
+
+    def decrement(self, user_ids, field, amount=1):
+        """
+        Subtract ``amount`` from a counter of every given user in one UPDATE.
+
+        Users without a stats row are skipped; their row is counted from the
+        tables the next time it is incremented.
+        """
+
+        if isinstance(user_ids, int):
+            user_ids = [user_ids]
+
+        self.filter(user_id__in=user_ids, **{f"{field}__gte": amount}).update(
+            **{field: F(field) - amount}
+        )
+
+    def for_user(self, user):
+        """
+        Return the stats row of ``user``, counting it from the tables if missing.
+        """
+
+        try:
+            return self.get(user=user)
+        except self.model.DoesNotExist:
+            self.increment(user.pk, "notes_owned", 0)
+            return self.get(user=user)
+
+
+class UserNoteStats(models.Model):
+    """
+    Denormalized per-user counters, kept in sync by the handlers in counters.py so
+    list endpoints and dashboards do not have to run ``COUNT(*)`` queries.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="note_stats"
+    )
+    notes_owned = models.PositiveIntegerField(default=0)
+    notes_shared_with_me = models.PositiveIntegerField(default=0)
+
+    objects = UserNoteStatsManager()
+
+    def __str__(self):
+        return f"Note stats for {self.user_id}"
+
+
+class DeletionJob(models.Model):
+    """
+    A queued request to delete a user together with their notes and shares,
+    processed in batches by the ``run_deletion_jobs`` management command.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    # Not a foreign key, the job outlives the user it deletes.
+    target_user_id = models.BigIntegerField(db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Delete user {self.target_user_id} ({self.status})"
+
+
+class NoteRevision(models.Model):
+    """
+    A saved version of a note. Revisions hold either a full snapshot of the
+    content or a line delta from the next revision back to this one, see
+    revisions.py.
+    """
+
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name="revisions")
+    number = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    is_snapshot = models.BooleanField(default=False)
+    data = models.TextField()
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("note", "number")
+
+    def __str__(self):
+        return f"{self.note_id} revision {self.number}"
+
+
+class Tag(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tags")
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        unique_together = ("user", "name")
+
+    def __str__(self):
+        return self.name
+
+
+class NoteTagManager(models.Manager):
+    def set_for_note(self, note, names):
+        """
+        Make ``names`` the tags of ``note``, creating the owner's missing tags.
+        """
+
+        names = set(names)
+        Tag.objects.bulk_create(
+            [Tag(user_id=note.user_id, name=name) for name in names],
+            ignore_conflicts=True,
+        )
+        tags = list(Tag.objects.filter(user_id=note.user_id, name__in=names))
+
+        self.filter(note=note).exclude(tag__in=tags).delete()
+        self.bulk_create(
+            [
+                NoteTag(
+                    note=note, tag=tag, user_id=note.user_id, timestamp=note.timestamp
+                )
+                for tag in tags
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class NoteTag(models.Model):
+    """
+    Through table of Note.tags. The owner and timestamp are copied from the note
+    so filtering a user's notes by tag and date is a range scan of one index.
+    """
+
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name="note_tags")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="note_tags")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    timestamp = models.DateTimeField()
+
+    objects = NoteTagManager()
+
+    class Meta:
+        unique_together = ("note", "tag")
+        indexes = [models.Index(fields=["user", "tag", "-timestamp"])]
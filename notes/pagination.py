@@ -0,0 +1,28 @@
+from django.core.paginator import Paginator
+from rest_framework.pagination import PageNumberPagination
+
+
+class KnownCountPaginator(Paginator):
+    """
+    Django paginator that is given the total number of objects up front instead
+    of running ``COUNT(*)`` over the object list.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+class CountedPageNumberPagination(PageNumberPagination):
+    """
+    Page number pagination backed by a denormalized counter, so a page fetch is
+    a single ``LIMIT``/``OFFSET`` read.
+    """
+
+    page_size = 10
+
+    def __init__(self, count):
+        self.count = count
+
+    def django_paginator_class(self, object_list, per_page):
+        return KnownCountPaginator(object_list, per_page, self.count)
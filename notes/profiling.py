@@ -0,0 +1,185 @@
+import cProfile
+import io
+import json
+import pstats
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connection
+
+PROFILE_NAME_RE = re.compile(r"^\d+-[0-9a-f]{32}\.json$")
+
+
+def get_profile_dir():
+    """
+    Return the directory backing the slow-request ring buffer, creating it if needed.
+    """
+
+    profile_dir = settings.SLOW_REQUEST_PROFILE_DIR
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    return profile_dir
+
+
+def save_profile(record):
+    """
+    Write a profile record to the ring buffer and drop the oldest entries so that
+    at most ``SLOW_REQUEST_PROFILE_LIMIT`` files are kept on disk.
+
+    File names start with a nanosecond timestamp, so sorting them by name orders
+    them from oldest to newest.
+    """
+
+    profile_dir = get_profile_dir()
+    name = f"{time.time_ns()}-{uuid.uuid4().hex}.json"
+    (profile_dir / name).write_text(json.dumps(record))
+
+    profiles = sorted(
+        path for path in profile_dir.iterdir() if PROFILE_NAME_RE.match(path.name)
+    )
+    # Slicing with the negated limit would keep everything for a limit of 0.
+    excess = len(profiles) - max(settings.SLOW_REQUEST_PROFILE_LIMIT, 1)
+    for path in profiles[: max(excess, 0)]:
+        path.unlink(missing_ok=True)
+
+    return name
+
+
+def list_profiles():
+    """
+    Return a summary of every stored profile, newest first.
+    """
+
+    profile_dir = get_profile_dir()
+    summaries = []
+    for path in sorted(profile_dir.iterdir(), reverse=True):
+        if not PROFILE_NAME_RE.match(path.name):
+            continue
+        try:
+            record = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        summaries.append(
+            {
+                "name": path.name,
+                "method": record["method"],
+                "path": record["path"],
+                "status": record["status"],
+                "duration_ms": record["duration_ms"],
+                "query_count": record["query_count"],
+                "reason": record["reason"],
+                "created": record["created"],
+            }
+        )
+    return summaries
+
+
+def load_profile(name):
+    """
+    Return the stored profile called ``name``, or None if it does not exist.
+    """
+
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    try:
+        return json.loads((get_profile_dir() / name).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that counts every SQL statement and records the
+    first ``limit`` of them with their duration.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.count = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            if len(self.queries) < self.limit:
+                self.queries.append(
+                    {
+                        "sql": sql,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                    }
+                )
+
+
+class SlowRequestProfilerMiddleware:
+    """
+    Profile requests with cProfile and record the SQL they execute, keeping the
+    result when the request was slower than ``SLOW_REQUEST_THRESHOLD_MS`` or was
+    picked by ``SLOW_REQUEST_SAMPLE_RATE``.
+
+    The middleware is opt-in through ``SLOW_REQUEST_PROFILER_ENABLED`` and removes
+    itself from the chain when disabled. While enabled every request pays the
+    cProfile overhead, so only turn it on while investigating.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_REQUEST_PROFILER_ENABLED:
+            raise MiddlewareNotUsed()
+        if settings.SLOW_REQUEST_PROFILE_LIMIT < 1:
+            raise ImproperlyConfigured("SLOW_REQUEST_PROFILE_LIMIT must be at least 1.")
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profiler = cProfile.Profile()
+        recorder = QueryRecorder(settings.SLOW_REQUEST_PROFILE_QUERY_LIMIT)
+
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this thread.
+            profiler = None
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        if duration_ms >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            reason = "slow"
+        elif random.random() < settings.SLOW_REQUEST_SAMPLE_RATE:
+            reason = "sampled"
+        else:
+            return response
+
+        stats = ""
+        if profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(
+                settings.SLOW_REQUEST_PROFILE_STATS_LINES
+            )
+            stats = stream.getvalue()
+
+        save_profile(
+            {
+                "method": request.method,
+                "path": request.get_full_path(),
+                "user": getattr(getattr(request, "user", None), "pk", None),
+                "status": response.status_code,
+                "duration_ms": round(duration_ms, 3),
+                "reason": reason,
+                "created": time.time(),
+                "query_count": recorder.count,
+                "queries": recorder.queries,
+                "profile": stats,
+            }
+        )
+        return response
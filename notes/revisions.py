@@ -0,0 +1,160 @@
+import json
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import NoteRevision
+
+
+def encode_delta(old, new):
+    """
+    Encode the line changes turning ``old`` into ``new`` as a compact JSON list.
+
+    Positive integers copy that many lines from the old text, negative integers
+    skip that many old lines and strings are inserted as they are.
+    """
+
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append("".join(new_lines[j1:j2]))
+
+    return json.dumps(ops, separators=(",", ":"))
+
+
+def apply_delta(old, delta):
+    """
+    Rebuild the new text from ``old`` and a delta produced by ``encode_delta``.
+    """
+
+    old_lines = old.splitlines(keepends=True)
+    position = 0
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            parts.extend(old_lines[position : position + op])
+            position += op
+        else:
+            position -= op
+
+    return "".join(parts)
+
+
+def reconstruct(revisions):
+    """
+    Return the content of the last revision in ``revisions``, which must start
+    with a snapshot and go from newer to older revisions.
+    """
+
+    content = None
+    for revision in revisions:
+        if revision.is_snapshot:
+            content = revision.data
+        else:
+            content = apply_delta(content, revision.data)
+
+    return content
+
+
+def is_checkpoint_number(number):
+    return number % settings.REVISION_SNAPSHOT_INTERVAL == 0
+
+
+def get_revision_content(note, number):
+    """
+    Return the content of revision ``number`` of ``note``, or None if it does not
+    exist.
+
+    The latest revision and every ``REVISION_SNAPSHOT_INTERVAL``-th one hold a
+    full snapshot, so at most that many revisions are read and applied, unless
+    the interval was lowered after the revisions were written.
+    """
+
+    revisions = NoteRevision.objects.filter(note=note, number__gte=number)
+    window = list(
+        revisions.filter(
+            number__lt=number + settings.REVISION_SNAPSHOT_INTERVAL
+        ).order_by("-number")
+    )
+    if not window or window[-1].number != number:
+        return None
+
+    snapshots = [i for i, revision in enumerate(window) if revision.is_snapshot]
+    if snapshots:
+        return reconstruct(window[snapshots[-1] :])
+
+    # The interval was lowered after these revisions were written.
+    snapshot = (
+        revisions.filter(is_snapshot=True)
+        .order_by("number")
+        .values_list("number", flat=True)
+        .first()
+    )
+    return reconstruct(revisions.filter(number__lte=snapshot).order_by("-number"))
+
+
+def previous_revision_delta(previous, content):
+    """
+    Return the delta that replaces the snapshot held by ``previous`` once
+    ``content`` is recorded after it, or None if it stays a snapshot.
+    """
+
+    if is_checkpoint_number(previous.number):
+        return None
+
+    # A rewrite can make the delta larger than the note itself.
+    delta = encode_delta(content, previous.data)
+    if len(delta) >= len(previous.data):
+        return None
+    return delta
+
+
+def record_revision(note, previous_title=None, previous_content=None):
+    """
+    Store the current title and content of ``note`` as its next revision.
+
+    The new revision is a full snapshot and the previous one, unless it is a
+    checkpoint, is replaced by a delta from the new content back to its own,
+    so recording a revision only reads the previous revision. Creating a note
+    does not record a revision, so on the first edit ``previous_title`` and
+    ``previous_content`` are stored as revision 1 first.
+    """
+
+    with transaction.atomic():
+        latest = NoteRevision.objects.filter(note=note).order_by("-number").first()
+
+        if latest is None and previous_content is not None:
+            latest = NoteRevision.objects.create(
+                note=note,
+                number=1,
+                title=previous_title,
+                is_snapshot=True,
+                data=previous_content,
+            )
+
+        if latest is not None:
+            delta = previous_revision_delta(latest, note.content)
+            if delta is not None:
+                NoteRevision.objects.filter(pk=latest.pk).update(
+                    is_snapshot=False, data=delta
+                )
+
+        return NoteRevision.objects.create(
+            note=note,
+            number=latest.number + 1 if latest is not None else 1,
+            title=note.title,
+            is_snapshot=True,
+            data=note.content,
+        )
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Note
+from .models import Note, NoteRevision
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -9,8 +9,31 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "email", "password"]
 
 
+class TagListField(serializers.ListField):
+    child = serializers.CharField(max_length=50)
+
+    def to_representation(self, tags):
+        return sorted(tag.name for tag in tags.all())
+
+
 class NoteSerializer(serializers.ModelSerializer):
+    tags = TagListField(required=False)
+
     class Meta(object):
         model = Note
-        fields = ["id", "title", "content", "timestamp"]
-        read_only_fields = ["user"]
+        fields = [
+            "id",
+            "title",
+            "content",
+            "timestamp",
+            "recipient_count",
+            "version",
+            "tags",
+        ]
+        read_only_fields = ["user", "recipient_count", "version"]
+
+
+class NoteRevisionSerializer(serializers.ModelSerializer):
+    class Meta(object):
+        model = NoteRevision
+        fields = ["number", "title", "timestamp"]
@@ -1,9 +1,32 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.contrib.auth.models import User
-from .models import Note, SharedNote
+from notesapi import settings_api
+from .models import (
+    DeletionJob,
+    Note,
+    NoteRevision,
+    NoteTag,
+    SharedNote,
+    Tag,
+    UserNoteStats,
+)
+from .deletion import delete_note
+from .profiling import SlowRequestProfilerMiddleware
+from .revisions import apply_delta, encode_delta, record_revision
 from rest_framework.authtoken.models import Token
 from .serializers import NoteSerializer
 
@@ -93,3 +116,828 @@ class APITests(TestCase):
         url = reverse("user_logout")
         response = self.client.get(url)  # Send POST request to logout endpoint
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class NoteCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        self.recipient = User.objects.create_user(
+            username="recipient", email="recipient@example.com", password="password456"
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_note(self, title="Test Note"):
+        response = self.client.post(
+            reverse("note_create"),
+            {"title": title, "content": "This is a test note"},
+            format="json",
+        )
+        return response.data["id"]
+
+    def test_counters_follow_notes_and_shares(self):
+        # Creating and sharing notes updates the counters of both users
+        note_id = self.create_note()
+        self.create_note("Second Note")
+        response = self.client.post(
+            reverse("note_share", kwargs={"pk": note_id}),
+            {"email": "recipient@example.com"},
+            format="json",
+        )
+        self.assertEqual(response.data["recipient_count"], 1)
+
+        self.assertEqual(UserNoteStats.objects.get(user=self.user).notes_owned, 2)
+        self.assertEqual(
+            UserNoteStats.objects.get(user=self.recipient).notes_shared_with_me, 1
+        )
+        self.assertEqual(Note.objects.get(pk=note_id).recipient_count, 1)
+
+        # Deleting the note cascades to the share and both counters drop
+        self.client.delete(reverse("note_create", kwargs={"pk": note_id}))
+        self.assertEqual(UserNoteStats.objects.get(user=self.user).notes_owned, 1)
+        self.assertEqual(
+            UserNoteStats.objects.get(user=self.recipient).notes_shared_with_me, 0
+        )
+
+    def test_missing_counters_are_backfilled(self):
+        # Users without a stats row get one counted from the tables
+        note = Note.objects.create(user=self.user, title="Old", content="Old")
+        SharedNote.objects.create(note=note, recipient=self.recipient)
+        UserNoteStats.objects.all().delete()
+
+        response = self.client.get(reverse("note_stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["notes_owned"], 1)
+
+        self.client.force_authenticate(user=self.recipient)
+        response = self.client.get(reverse("note_stats"))
+        self.assertEqual(response.data["notes_shared_with_me"], 1)
+
+    def test_list_endpoints_do_not_count(self):
+        # Page fetches use the counter instead of a COUNT(*) query
+        for i in range(12):
+            self.create_note(f"Note {i}")
+
+        # One query each for the counter, the page and the page's tags
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("note_list"))
+        self.assertEqual(response.data["count"], 12)
+        self.assertEqual(len(response.data["results"]), 10)
+
+        response = self.client.get(reverse("note_list"), {"page": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_shared_list_uses_counter(self):
+        # Shared notes are paginated by the recipient's counter
+        note_id = self.create_note()
+        self.client.post(
+            reverse("note_share", kwargs={"pk": note_id}),
+            {"email": "recipient@example.com"},
+            format="json",
+        )
+
+        self.client.force_authenticate(user=self.recipient)
+        response = self.client.get(reverse("note_list_shared"))
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["id"], note_id)
+
+    def test_shared_list_is_read_in_index_order(self):
+        # Shares copy the note timestamp, so the page needs no separate sort
+        older = Note.objects.create(user=self.user, title="Older", content="Older")
+        newer = Note.objects.create(user=self.user, title="Newer", content="Newer")
+        SharedNote.objects.create(note=newer, recipient=self.recipient)
+        SharedNote.objects.create(note=older, recipient=self.recipient)
+        self.assertEqual(SharedNote.objects.get(note=older).timestamp, older.timestamp)
+
+        self.client.force_authenticate(user=self.recipient)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("note_list_shared"))
+        self.assertEqual(
+            [note["id"] for note in response.data["results"]], [newer.id, older.id]
+        )
+
+        page = next(q["sql"] for q in queries if 'FROM "notes_note"' in q["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {page}")
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class UnshareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        self.recipients = [
+            User.objects.create_user(
+                username=f"recipient{i}",
+                email=f"recipient{i}@example.com",
+                password="password456",
+            )
+            for i in range(3)
+        ]
+        self.note = Note.objects.create(
+            user=self.user, title="Test Note", content="This is a test note"
+        )
+        for recipient in self.recipients:
+            SharedNote.objects.create(note=self.note, recipient=recipient)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def shared_count(self, user):
+        return UserNoteStats.objects.get(user=user).notes_shared_with_me
+
+    def test_unshare_note(self):
+        # Revoking one recipient leaves the other shares in place
+        url = reverse("note_unshare", kwargs={"pk": self.note.id})
+        response = self.client.post(
+            url, {"email": "recipient0@example.com"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(SharedNote.objects.filter(note=self.note).count(), 2)
+        self.assertEqual(self.shared_count(self.recipients[0]), 0)
+        self.assertEqual(self.shared_count(self.recipients[1]), 1)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.recipient_count, 2)
+
+        # Revoking again reports that the note is not shared
+        response = self.client.post(
+            url, {"email": "recipient0@example.com"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unshare_note_all(self):
+        # All recipients are revoked in a constant number of queries
+        url = reverse("note_unshare_all", kwargs={"pk": self.note.id})
+        with self.assertNumQueries(7):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["revoked"], 3)
+        self.assertFalse(SharedNote.objects.filter(note=self.note).exists())
+        for recipient in self.recipients:
+            self.assertEqual(self.shared_count(recipient), 0)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.recipient_count, 0)
+
+    def test_revoke_does_not_list_recipients(self):
+        # The shares are deleted and counted by note, not by recipient ids
+        with CaptureQueriesContext(connection) as queries:
+            SharedNote.objects.revoke(self.note.id)
+        statements = [q["sql"] for q in queries]
+
+        delete = next(sql for sql in statements if sql.startswith("DELETE"))
+        self.assertNotIn(" IN (", delete)
+        decrement = next(sql for sql in statements if "notes_usernotestats" in sql)
+        self.assertIn(" IN (SELECT", decrement)
+
+    def test_revoke_clamps_recipient_count(self):
+        # A counter that drifted below the number of shares still reaches zero
+        Note.objects.filter(pk=self.note.id).update(recipient_count=1)
+        self.assertEqual(SharedNote.objects.revoke(self.note.id), 3)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.recipient_count, 0)
+
+        # Nothing is left to revoke, so no counter changes
+        self.assertEqual(SharedNote.objects.revoke(self.note.id), 0)
+
+    def test_unshare_requires_owner(self):
+        # Recipients cannot revoke other recipients
+        self.client.force_authenticate(user=self.recipients[0])
+        url = reverse("note_unshare_all", kwargs={"pk": self.note.id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(SharedNote.objects.filter(note=self.note).count(), 3)
+
+    def test_leave_shared_note(self):
+        # A recipient can remove a shared note from their own list
+        self.client.force_authenticate(user=self.recipients[0])
+        url = reverse("note_leave", kwargs={"pk": self.note.id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.shared_count(self.recipients[0]), 0)
+
+        response = self.client.get(reverse("note_create", kwargs={"pk": self.note.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DeletionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="other", email="other@example.com", password="password456"
+        )
+        self.token = Token.objects.create(user=self.user)
+
+        # Notes of the user shared with the other user, and the other way round
+        self.notes = [
+            Note.objects.create(user=self.user, title=f"Note {i}", content="Content")
+            for i in range(5)
+        ]
+        for note in self.notes:
+            SharedNote.objects.create(note=note, recipient=self.other)
+            NoteTag.objects.set_for_note(note, ["tag"])
+        self.other_note = Note.objects.create(
+            user=self.other, title="Other Note", content="Content"
+        )
+        SharedNote.objects.create(note=self.other_note, recipient=self.user)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_delete_note_with_shares(self):
+        # Deleting a note removes its shares without loading them
+        url = reverse("note_create", kwargs={"pk": self.notes[0].id})
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Note.objects.filter(pk=self.notes[0].id).exists())
+        self.assertEqual(UserNoteStats.objects.get(user=self.user).notes_owned, 4)
+        self.assertEqual(
+            UserNoteStats.objects.get(user=self.other).notes_shared_with_me, 4
+        )
+
+    def test_delete_note_twice(self):
+        # A note deleted twice only lowers the owner's counter once
+        delete_note(self.notes[0])
+        delete_note(self.notes[0])
+        self.assertEqual(UserNoteStats.objects.get(user=self.user).notes_owned, 4)
+
+    def test_delete_account_queues_job(self):
+        # The account is deactivated and queued rather than deleted inline
+        response = self.client.delete(reverse("user_delete"))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(
+            DeletionJob.objects.filter(
+                target_user_id=self.user.id, status=DeletionJob.PENDING
+            ).exists()
+        )
+        self.assertFalse(User.objects.get(pk=self.user.id).is_active)
+
+        # The token no longer authenticates
+        response = self.client.get(reverse("note_list"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Logging in again does not issue a new token
+        response = self.client.post(
+            reverse("user_login"), {"username": "testuser", "password": "password123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+    def test_run_deletion_jobs(self):
+        # The command removes shares, notes and the user in small batches
+        self.client.delete(reverse("user_delete"))
+        call_command("run_deletion_jobs", batch_size=2, stdout=StringIO())
+
+        self.assertFalse(User.objects.filter(pk=self.user.id).exists())
+        self.assertFalse(Tag.objects.filter(user_id=self.user.id).exists())
+        self.assertFalse(Note.objects.filter(user_id=self.user.id).exists())
+        self.assertFalse(SharedNote.objects.filter(recipient_id=self.user.id).exists())
+        self.assertEqual(
+            DeletionJob.objects.get(target_user_id=self.user.id).status,
+            DeletionJob.DONE,
+        )
+
+        # The other user's counters no longer include the deleted shares
+        self.assertEqual(
+            UserNoteStats.objects.get(user=self.other).notes_shared_with_me, 0
+        )
+        self.other_note.refresh_from_db()
+        self.assertEqual(self.other_note.recipient_count, 0)
+
+    def test_failed_job_is_retried(self):
+        # A job that stopped partway finishes on the next run
+        self.client.delete(reverse("user_delete"))
+        with mock.patch("notes.deletion.User") as user_model:
+            user_model.objects.filter.return_value.delete.side_effect = DatabaseError(
+                "connection lost"
+            )
+            call_command("run_deletion_jobs", stdout=StringIO(), stderr=StringIO())
+
+        job = DeletionJob.objects.get(target_user_id=self.user.id)
+        self.assertEqual(job.status, DeletionJob.FAILED)
+        self.assertFalse(Note.objects.filter(user_id=self.user.id).exists())
+        self.assertTrue(User.objects.filter(pk=self.user.id).exists())
+
+        call_command("run_deletion_jobs", stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.DONE)
+        self.assertEqual(job.error, "")
+        self.assertFalse(User.objects.filter(pk=self.user.id).exists())
+
+    def test_abandoned_job_is_reclaimed(self):
+        # Running jobs are only taken over once their lease has expired
+        job = DeletionJob.objects.create(
+            target_user_id=self.user.id,
+            status=DeletionJob.RUNNING,
+            started_at=timezone.now(),
+        )
+        call_command("run_deletion_jobs", stdout=StringIO())
+        self.assertTrue(User.objects.filter(pk=self.user.id).exists())
+
+        DeletionJob.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(hours=2)
+        )
+        call_command("run_deletion_jobs", stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.DONE)
+        self.assertFalse(User.objects.filter(pk=self.user.id).exists())
+
+
+@override_settings(REVISION_SNAPSHOT_INTERVAL=3)
+class RevisionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(
+            reverse("note_create"),
+            {"title": "Draft", "content": "line 1\nline 2\nline 3"},
+            format="json",
+        )
+        self.note_id = response.data["id"]
+        self.version = response.data["version"]
+
+    def update(self, content):
+        url = reverse("note_create", kwargs={"pk": self.note_id})
+        response = self.client.patch(
+            url, {"content": content, "version": self.version}, format="json"
+        )
+        self.version = response.data["version"]
+
+    def test_delta_round_trip(self):
+        # Deltas rebuild the exact text, including missing trailing newlines
+        old = "a\nb\nc\nd"
+        new = "a\nB\nc\nd\ne"
+        self.assertEqual(apply_delta(old, encode_delta(old, new)), new)
+        self.assertEqual(apply_delta(old, encode_delta(old, "")), "")
+
+    def test_updates_are_stored_as_deltas(self):
+        # The latest revision and every third one are snapshots, the others are
+        # deltas. The API strips surrounding whitespace, so the contents have
+        # no final newline.
+        contents = ["line 1\nline 2\nline 3"]
+        for i in range(6):
+            contents.append(contents[-1] + f"\nline {i + 4}")
+            self.update(contents[-1])
+
+        revisions = NoteRevision.objects.filter(note_id=self.note_id).order_by("number")
+        self.assertEqual(
+            [r.is_snapshot for r in revisions],
+            [False, False, True, False, False, True, True],
+        )
+
+        # Every version can be fetched back
+        for number, content in enumerate(contents, start=1):
+            url = reverse(
+                "note_revision", kwargs={"pk": self.note_id, "number": number}
+            )
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["content"], content)
+
+    def test_interval_lowered_after_writing(self):
+        # Without a snapshot in the window the next snapshot is found instead
+        contents = ["line 1\nline 2\nline 3"]
+        for i in range(3):
+            contents.append(contents[-1] + f"\nline {i + 4}")
+            self.update(contents[-1])
+
+        with override_settings(REVISION_SNAPSHOT_INTERVAL=2):
+            url = reverse("note_revision", kwargs={"pk": self.note_id, "number": 1})
+            response = self.client.get(url)
+        self.assertEqual(response.data["content"], contents[0])
+
+    def test_list_revisions(self):
+        # Revisions are listed newest first
+        self.update("changed")
+        response = self.client.get(
+            reverse("note_revisions", kwargs={"pk": self.note_id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["results"][0]["number"], 2)
+
+    def test_revisions_of_unknown_note(self):
+        # Other users cannot read the history of a note not shared with them
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="password456"
+        )
+        self.client.force_authenticate(user=other)
+        response = self.client.get(
+            reverse("note_revision", kwargs={"pk": self.note_id, "number": 1})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_and_tag_changes_store_no_revision(self):
+        # The note itself holds its current content until the text is edited
+        self.assertFalse(NoteRevision.objects.filter(note_id=self.note_id).exists())
+
+        url = reverse("note_create", kwargs={"pk": self.note_id})
+        self.client.patch(url, {"tags": ["work"], "version": 1}, format="json")
+        self.client.patch(url, {"title": "Final", "version": 2}, format="json")
+        self.client.patch(url, {"tags": [], "version": 3}, format="json")
+
+        revisions = NoteRevision.objects.filter(note_id=self.note_id).order_by("number")
+        self.assertEqual([r.title for r in revisions], ["Draft", "Final"])
+
+    def test_note_without_revisions(self):
+        # The first edit stores the original title and content as revision 1
+        note = Note.objects.create(user=self.user, title="Old", content="old")
+        url = reverse("note_create", kwargs={"pk": note.id})
+        self.client.patch(url, {"content": "new", "version": 1}, format="json")
+
+        url = reverse("note_revision", kwargs={"pk": note.id, "number": 1})
+        response = self.client.get(url)
+        self.assertEqual(response.data["content"], "old")
+
+        url = reverse("note_revision", kwargs={"pk": note.id, "number": 2})
+        response = self.client.get(url)
+        self.assertEqual(response.data["content"], "new")
+
+
+class NoteVersionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        self.note = Note.objects.create(
+            user=self.user, title="Test Note", content="This is a test note"
+        )
+        self.url = reverse("note_create", kwargs={"pk": self.note.id})
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_get_returns_etag(self):
+        # The version is exposed for use in If-Match
+        response = self.client.get(self.url)
+        self.assertEqual(response["ETag"], '"1"')
+        self.assertEqual(response.data["version"], 1)
+
+    def test_update_with_if_match(self):
+        # A matching version is applied and bumps the version
+        response = self.client.patch(
+            self.url, {"title": "Edited"}, format="json", HTTP_IF_MATCH='"1"'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], 2)
+        self.assertEqual(response.data["content"], "This is a test note")
+        self.assertEqual(response["ETag"], '"2"')
+
+    def test_stale_update_is_rejected(self):
+        # A second device editing from the same version gets a conflict
+        self.client.put(
+            self.url,
+            {"title": "First", "content": "First", "version": 1},
+            format="json",
+        )
+        response = self.client.put(
+            self.url,
+            {"title": "Second", "content": "Second", "version": 1},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.data["version"], 2)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.title, "First")
+
+    def test_update_requires_version(self):
+        # Updates without a version are refused
+        response = self.client.patch(self.url, {"title": "Edited"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_428_PRECONDITION_REQUIRED)
+
+    def test_invalid_version(self):
+        # Versions that are not numbers are rejected, whatever their JSON type
+        for version in ["abc", [1], {"a": 1}]:
+            response = self.client.patch(
+                self.url, {"title": "Edited", "version": version}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_unknown_note(self):
+        # Notes of other users are reported as missing, not as conflicts
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="password456"
+        )
+        self.client.force_authenticate(user=other)
+        response = self.client.patch(
+            self.url, {"title": "Edited"}, format="json", HTTP_IF_MATCH='"1"'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_does_not_read_note_first(self):
+        # Once the note has a history, it is not selected before the UPDATE
+        record_revision(self.note)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(
+                self.url, {"title": "Edited"}, format="json", HTTP_IF_MATCH='"1"'
+            )
+        statements = [q["sql"] for q in queries]
+        update = next(i for i, sql in enumerate(statements) if sql.startswith("UPDATE"))
+        self.assertTrue(statements[update].startswith('UPDATE "notes_note"'))
+        self.assertFalse(any('FROM "notes_note"' in sql for sql in statements[:update]))
+
+    def test_if_match_any_version(self):
+        # "*" accepts whatever version the note is at
+        response = self.client.patch(
+            self.url, {"title": "Edited"}, format="json", HTTP_IF_MATCH="*"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], 2)
+
+    def test_if_match_several_versions(self):
+        # Any of the listed versions is accepted
+        response = self.client.patch(
+            self.url, {"title": "Edited"}, format="json", HTTP_IF_MATCH='"3", "1"'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(
+            self.url, {"title": "Again"}, format="json", HTTP_IF_MATCH='"1", W/"3"'
+        )
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_empty_patch_changes_nothing(self):
+        # A PATCH without fields keeps the version and adds no revision
+        response = self.client.patch(self.url, {}, format="json", HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], 1)
+        self.assertFalse(NoteRevision.objects.filter(note=self.note).exists())
+
+        response = self.client.patch(self.url, {}, format="json", HTTP_IF_MATCH='"2"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        self.recipient = User.objects.create_user(
+            username="recipient", email="recipient@example.com", password="password456"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_note(self, title, tags):
+        response = self.client.post(
+            reverse("note_create"),
+            {"title": title, "content": "Content", "tags": tags},
+            format="json",
+        )
+        return response.data
+
+    def titles(self, response):
+        return sorted(note["title"] for note in response.data["results"])
+
+    def test_create_note_with_tags(self):
+        # Tags are created for the owner and returned with the note
+        note = self.create_note("Work", ["work", "urgent"])
+        self.assertEqual(note["tags"], ["urgent", "work"])
+        self.assertEqual(
+            sorted(Tag.objects.filter(user=self.user).values_list("name", flat=True)),
+            ["urgent", "work"],
+        )
+
+        response = self.client.get(reverse("tag_list"))
+        self.assertEqual(response.data, ["urgent", "work"])
+
+    def test_update_tags(self):
+        # Tags given in an update replace the note's tags
+        note = self.create_note("Work", ["work", "urgent"])
+        url = reverse("note_create", kwargs={"pk": note["id"]})
+        response = self.client.patch(
+            url, {"tags": ["work", "later"], "version": note["version"]}, format="json"
+        )
+        self.assertEqual(response.data["tags"], ["later", "work"])
+        self.assertEqual(NoteTag.objects.filter(note_id=note["id"]).count(), 2)
+
+    def test_filter_created_notes_by_tag(self):
+        # Only notes with the tag are listed
+        self.create_note("Work", ["work"])
+        self.create_note("Home", ["home"])
+        self.create_note("Both", ["work", "home"])
+
+        response = self.client.get(reverse("note_list"), {"tag": "work"})
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(self.titles(response), ["Both", "Work"])
+
+        response = self.client.get(reverse("note_list"), {"tag": "missing"})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_filter_created_notes_by_date(self):
+        # Notes outside the date range are left out
+        self.create_note("Old", ["work"])
+        self.create_note("New", ["work"])
+        Note.objects.filter(title="Old").update(timestamp="2020-01-01T00:00:00Z")
+        NoteTag.objects.filter(note__title="Old").update(
+            timestamp="2020-01-01T00:00:00Z"
+        )
+
+        response = self.client.get(reverse("note_list"), {"after": "2021-01-01"})
+        self.assertEqual(self.titles(response), ["New"])
+
+        params = {"tag": "work", "before": "2021-01-01"}
+        response = self.client.get(reverse("note_list"), params)
+        self.assertEqual(self.titles(response), ["Old"])
+
+        response = self.client.get(reverse("note_list"), {"after": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_created_notes_by_shared(self):
+        # Owned notes can be split into shared and not shared
+        shared = self.create_note("Shared", [])
+        self.create_note("Private", [])
+        self.client.post(
+            reverse("note_share", kwargs={"pk": shared["id"]}),
+            {"email": "recipient@example.com"},
+            format="json",
+        )
+
+        response = self.client.get(reverse("note_list"), {"shared": "true"})
+        self.assertEqual(self.titles(response), ["Shared"])
+        response = self.client.get(reverse("note_list"), {"shared": "false"})
+        self.assertEqual(self.titles(response), ["Private"])
+
+    def test_filter_shared_notes_by_tag(self):
+        # Recipients can filter shared notes by the owner's tags
+        for title, tags in [("Work", ["work"]), ("Home", ["home"])]:
+            note = self.create_note(title, tags)
+            self.client.post(
+                reverse("note_share", kwargs={"pk": note["id"]}),
+                {"email": "recipient@example.com"},
+                format="json",
+            )
+
+        self.client.force_authenticate(user=self.recipient)
+        response = self.client.get(reverse("note_list_shared"), {"tag": "home"})
+        self.assertEqual(self.titles(response), ["Home"])
+        self.assertEqual(response.data["results"][0]["tags"], ["home"])
+
+    def test_tags_are_prefetched(self):
+        # Listing a page of tagged notes does not query tags per note
+        for i in range(5):
+            self.create_note(f"Note {i}", ["work", f"tag {i}"])
+
+        # One query each for the tag id, the count, the page and the page's tags
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("note_list"), {"tag": "work"})
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_tag_filter_is_read_in_index_order(self):
+        # Filtering on the tag id lets the tag index return the page in order
+        for i in range(3):
+            self.create_note(f"Note {i}", ["work"])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("note_list"), {"tag": "work"})
+        page = next(
+            q["sql"]
+            for q in queries
+            if 'FROM "notes_note"' in q["sql"] and "ORDER BY" in q["sql"]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {page}")
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+@override_settings(ROOT_URLCONF="notesapi.urls_api")
+class APIOnlyURLTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        self.token = Token.objects.create(user=self.user)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_api_routes_are_served(self):
+        # The notes endpoints work with token authentication alone
+        response = self.client.get(reverse("note_list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_admin_is_not_routed(self):
+        # The admin site is not part of the API-only URLconf
+        response = self.client.get("/admin/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_api_settings_leave_out_browser_apps(self):
+        # Only the apps and middleware the token API needs are loaded
+        self.assertNotIn("django.contrib.admin", settings_api.INSTALLED_APPS)
+        self.assertNotIn("django.contrib.sessions", settings_api.INSTALLED_APPS)
+        self.assertIn("rest_framework.authtoken", settings_api.INSTALLED_APPS)
+        self.assertNotIn(
+            "django.contrib.sessions.middleware.SessionMiddleware",
+            settings_api.MIDDLEWARE,
+        )
+        self.assertNotIn(
+            "notes.profiling.SlowRequestProfilerMiddleware", settings_api.MIDDLEWARE
+        )
+        self.assertEqual(settings_api.ROOT_URLCONF, "notesapi.urls_api")
+        self.assertEqual(settings_api.WSGI_APPLICATION, "notesapi.wsgi_api.application")
+
+
+@override_settings(
+    SLOW_REQUEST_PROFILER_ENABLED=True,
+    SLOW_REQUEST_THRESHOLD_MS=0,
+    SLOW_REQUEST_PROFILE_LIMIT=2,
+)
+@modify_settings(
+    # The API-only settings leave the middleware out unless profiling is enabled
+    MIDDLEWARE={"append": "notes.profiling.SlowRequestProfilerMiddleware"}
+)
+class SlowRequestProfilerTests(TestCase):
+    def setUp(self):
+        # Point the ring buffer at a throwaway directory
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            SLOW_REQUEST_PROFILE_DIR=Path(self.profile_dir.name)
+        )
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        self.admin = User.objects.create_user(
+            username="admin", email="admin@example.com", password="password123"
+        )
+        self.admin.is_staff = True
+        self.admin.save()
+
+        self.client = APIClient()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.profile_dir.cleanup()
+
+    def test_slow_requests_are_profiled(self):
+        # Every request is over a zero threshold, so it should be recorded
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse("note_list"))
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse("profile_list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["reason"], "slow")
+
+        url = reverse("profile_detail", kwargs={"name": response.data[0]["name"]})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"], self.user.id)
+        self.assertTrue(response.data["queries"])
+
+    def test_ring_buffer_is_bounded(self):
+        # Only the newest SLOW_REQUEST_PROFILE_LIMIT profiles are kept
+        self.client.force_authenticate(user=self.user)
+        for _ in range(4):
+            self.client.get(reverse("note_list"))
+
+        self.assertEqual(len(list(Path(self.profile_dir.name).iterdir())), 2)
+
+    @override_settings(SLOW_REQUEST_PROFILE_QUERY_LIMIT=1)
+    def test_stored_queries_are_capped(self):
+        # Only the first statements are stored, the total is still counted
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse("note_list"))
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse("profile_list"))
+        self.assertGreater(response.data[0]["query_count"], 1)
+
+        url = reverse("profile_detail", kwargs={"name": response.data[0]["name"]})
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["queries"]), 1)
+
+    @override_settings(SLOW_REQUEST_PROFILE_LIMIT=0)
+    def test_profile_limit_must_be_positive(self):
+        # A limit of 0 would never trim the buffer, so it is rejected
+        with self.assertRaises(ImproperlyConfigured):
+            SlowRequestProfilerMiddleware(lambda request: None)
+
+    def test_profiles_require_staff(self):
+        # Regular users cannot read profiles
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("profile_list"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_profile(self):
+        # Names that are not in the buffer are reported as missing
+        self.client.force_authenticate(user=self.admin)
+        url = reverse("profile_detail", kwargs={"name": "..%2Fsettings.py"})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -5,9 +5,23 @@ urlpatterns = [
     path("register", views.signup, name="user_register"),
     path("login", views.login, name="user_login"),
     path("logout", views.logout, name="user_logout"),
+    path("account", views.delete_account, name="user_delete"),
     path("note/<int:pk>", views.rud_note, name="note_create"),
     path("note", views.create_note, name="note_create"),
+    path("note/<int:pk>/revisions", views.get_note_revisions, name="note_revisions"),
+    path(
+        "note/<int:pk>/revisions/<int:number>",
+        views.get_note_revision,
+        name="note_revision",
+    ),
     path("notes/created", views.get_all_created_notes, name="note_list"),
     path("notes/shared", views.get_all_shared_notes, name="note_list_shared"),
+    path("notes/stats", views.get_note_stats, name="note_stats"),
+    path("tags", views.get_tags, name="tag_list"),
     path("note/share/<int:pk>", views.share_note, name="note_share"),
+    path("note/unshare/<int:pk>", views.unshare_note, name="note_unshare"),
+    path("note/unshare/<int:pk>/all", views.unshare_note_all, name="note_unshare_all"),
+    path("note/leave/<int:pk>", views.leave_shared_note, name="note_leave"),
+    path("profiles", views.list_request_profiles, name="profile_list"),
+    path("profiles/<str:name>", views.get_request_profile, name="profile_detail"),
 ]
@@ -1,5 +1,18 @@
-from .serializers import UserSerializer, NoteSerializer
-from .models import Note, SharedNote
+from datetime import datetime
+
+from .serializers import UserSerializer, NoteSerializer, NoteRevisionSerializer
+from .models import (
+    DeletionJob,
+    Note,
+    NoteRevision,
+    NoteTag,
+    SharedNote,
+    Tag,
+    UserNoteStats,
+)
+from .deletion import delete_note
+from .revisions import get_revision_content, record_revision
+from .pagination import CountedPageNumberPagination
 
 from rest_framework import status
 from django.contrib.auth.models import User
@@ -10,11 +23,18 @@ from rest_framework.decorators import (
     authentication_classes,
     permission_classes,
 )
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.authentication import TokenAuthentication, SessionAuthentication
 
+from django.db import transaction
+from django.db.models import F, Q
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# Returned by get_requested_versions for "If-Match: *".
+ANY_VERSION = object()
 
 
 @api_view(["POST"])
@@ -41,14 +61,15 @@ def login(request):
                   "email": "<email>"
                 }
               }
-            - If authentication fails due to invalid credentials (HTTP 400 Bad Request):
+            - If authentication fails due to invalid credentials or a deactivated
+              account, such as one queued for deletion (HTTP 400 Bad Request):
               {
                 "message": "Invalid credentials"
               }
     """
 
     user = get_object_or_404(User, username=request.data["username"])
-    if not user.check_password(request.data["password"]):
+    if not user.check_password(request.data["password"]) or not user.is_active:
         return Response(
             {"message": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST
         )
@@ -140,6 +161,42 @@ def logout(request):
     )
 
 
+@api_view(["DELETE"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def delete_account(request):
+    """
+    Queue the authenticated user's account for deletion.
+
+    The account is deactivated and its token removed right away. The user, their notes
+    and all shares are deleted in batches by the ``run_deletion_jobs`` management command.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object of the user to delete.
+
+    Returns:
+        Response: A JSON response indicating that the deletion was queued.
+            - If the deletion is queued (HTTP 202 Accepted):
+              {
+                "message": "Account scheduled for deletion"
+              }
+
+    Raises:
+        None
+    """
+
+    with transaction.atomic():
+        DeletionJob.objects.get_or_create(
+            target_user_id=request.user.id, status=DeletionJob.PENDING
+        )
+        User.objects.filter(pk=request.user.id).update(is_active=False)
+        Token.objects.filter(user=request.user).delete()
+
+    return Response(
+        {"message": "Account scheduled for deletion"}, status=status.HTTP_202_ACCEPTED
+    )
+
+
 @api_view(["POST"])
 @authentication_classes([SessionAuthentication, TokenAuthentication])
 @permission_classes([IsAuthenticated])
@@ -173,7 +230,10 @@ def create_note(request):
     serializer = NoteSerializer(data=request.data)
 
     if serializer.is_valid():
-        serializer.save(user=request.user)
+        tags = serializer.validated_data.pop("tags", [])
+        with transaction.atomic():
+            note = serializer.save(user=request.user)
+            NoteTag.objects.set_for_note(note, tags)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -218,18 +278,33 @@ def rud_note(request, pk):
                       "field_name": ["error_message"]
                     }
                   }
-            - For PUT or PATCH request (Update):
+            - For PUT or PATCH request (Update), which must send the version it is based on
+              in the If-Match header or the "version" field. If-Match may list several
+              versions, or be "*" to accept any current version:
                 - If update is successful (HTTP 200 OK):
                   {
                     "id": <note_id>,
                     "title": "<updated_note_title>",
                     "content": "<updated_note_content>",
-                    "timestamp": "<updated_timestamp>"
+                    "timestamp": "<updated_timestamp>",
+                    "version": <new_version>
                   }
-                - If there are validation errors or the note does not exist (HTTP 400 Bad Request or HTTP 404 Not Found):
+                - If a PATCH changes nothing, the note is returned unchanged, also with
+                  HTTP 200 OK
+                - If there are validation errors, the version is not a number or the note
+                  does not exist (HTTP 400 Bad Request or HTTP 404 Not Found):
                   {
                     "error": "Note not found"  # or validation error details
                   }
+                - If no version is given (HTTP 428 Precondition Required):
+                  {
+                    "error": "Note version is required"
+                  }
+                - If the note was changed since that version (HTTP 412 Precondition Failed):
+                  {
+                    "error": "Note has been modified",
+                    "version": <current_version>
+                  }
             - For DELETE request (Delete):
                 - If deletion is successful (HTTP 204 No Content):
                   {
@@ -244,6 +319,9 @@ def rud_note(request, pk):
         None
     """
 
+    if request.method in ["PUT", "PATCH"]:
+        return update_note(request, pk)
+
     try:
         note = Note.objects.get(pk=pk, user=request.user)
     except Note.DoesNotExist:
@@ -263,24 +341,284 @@ def rud_note(request, pk):
     serializer = NoteSerializer(note)
 
     if request.method == "GET":
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-    if request.method in ["PUT", "PATCH"]:
-        serializer = NoteSerializer(
-            note, data=request.data, partial=request.method == "PATCH"
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED,
+            headers={"ETag": f'"{note.version}"'},
         )
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     if request.method == "DELETE":
-        note.delete()
+        delete_note(note)
         return Response(
             {"message": "Note deleted successfully"}, status=status.HTTP_204_NO_CONTENT
         )
 
 
+def get_requested_versions(request):
+    """
+    Return the note versions the client based its update on, taken from the
+    ``If-Match`` header or the ``version`` field of the request body, or None if
+    neither is given. ``If-Match: *`` accepts any current version and is returned
+    as ``ANY_VERSION``. Raises ValueError or TypeError if a version is not a
+    number.
+    """
+
+    if_match = request.headers.get("If-Match")
+    if if_match is not None:
+        if if_match.strip() == "*":
+            return ANY_VERSION
+        return [
+            int(etag.strip().removeprefix("W/").strip('"'))
+            for etag in if_match.split(",")
+        ]
+
+    version = request.data.get("version")
+    if version is not None:
+        return [int(version)]
+
+    return None
+
+
+def version_conflict(current):
+    """
+    Return the 404 or 412 response for an update whose note is missing or is
+    at the ``current`` version instead of the requested one.
+    """
+
+    if current is None:
+        return Response({"error": "Note not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(
+        {"error": "Note has been modified", "version": current},
+        status=status.HTTP_412_PRECONDITION_FAILED,
+        headers={"ETag": f'"{current}"'},
+    )
+
+
+def update_note(request, pk):
+    """
+    Apply a PUT or PATCH to a note owned by the authenticated user, if the note is
+    still at a version the client read.
+
+    The update is a single ``UPDATE ... WHERE id = ? AND version IN (...)``, so
+    the note is not read before writing and concurrent edits cannot overwrite
+    each other. The only exception is the first edit of the title or content,
+    which reads the original ones once to store them as revision 1, since
+    creating a note does not record a revision.
+    """
+
+    try:
+        versions = get_requested_versions(request)
+    except (TypeError, ValueError):
+        return Response(
+            {"error": "Invalid note version"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if versions is None:
+        return Response(
+            {"error": "Note version is required"},
+            status=status.HTTP_428_PRECONDITION_REQUIRED,
+        )
+
+    serializer = NoteSerializer(data=request.data, partial=request.method == "PATCH")
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    notes = Note.objects.filter(pk=pk, user=request.user)
+    if versions is not ANY_VERSION:
+        notes = notes.filter(version__in=versions)
+
+    tags = serializer.validated_data.pop("tags", None)
+    if not serializer.validated_data and tags is None:
+        # Nothing to change, so the version and history stay as they are
+        note = notes.first()
+        if note is None:
+            return version_conflict(
+                Note.objects.filter(pk=pk, user=request.user)
+                .values_list("version", flat=True)
+                .first()
+            )
+        return Response(
+            NoteSerializer(note).data,
+            status=status.HTTP_200_OK,
+            headers={"ETag": f'"{note.version}"'},
+        )
+
+    # Changing only the tags leaves the history as it is
+    edited = (
+        "title" in serializer.validated_data or "content" in serializer.validated_data
+    )
+
+    with transaction.atomic():
+        previous = None
+        if edited and not NoteRevision.objects.filter(note_id=pk).exists():
+            previous = notes.select_for_update().values("title", "content").first()
+
+        updated = notes.update(version=F("version") + 1, **serializer.validated_data)
+
+        if not updated:
+            return version_conflict(
+                Note.objects.filter(pk=pk, user=request.user)
+                .values_list("version", flat=True)
+                .first()
+            )
+
+        note = Note.objects.get(pk=pk)
+        if tags is not None:
+            NoteTag.objects.set_for_note(note, tags)
+        if previous is not None:
+            record_revision(note, previous["title"], previous["content"])
+        elif edited:
+            record_revision(note)
+
+    return Response(
+        NoteSerializer(note).data,
+        status=status.HTTP_200_OK,
+        headers={"ETag": f'"{note.version}"'},
+    )
+
+
+def get_readable_note(user, pk):
+    """
+    Return the note ``pk`` if it is owned by or shared with ``user``, otherwise None.
+    """
+
+    return (
+        Note.objects.filter(pk=pk)
+        .filter(Q(user=user) | Q(shared_with__recipient=user))
+        .first()
+    )
+
+
+@api_view(["GET"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def get_note_revisions(request, pk):
+    """
+    Retrieve the revisions of a note owned by or shared with the authenticated user,
+    newest first, with pagination.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object used for retrieving revisions.
+        pk (int): The primary key of the note.
+
+    Returns:
+        Response: A paginated JSON response containing the note's revisions.
+            - If the note is found (HTTP 200 OK):
+              {
+                "count": <total_revisions_count>,
+                "next": "<next_page_url>",
+                "previous": "<previous_page_url>",
+                "results": [
+                  {
+                    "number": <revision_number>,
+                    "title": "<note_title>",
+                    "timestamp": "<timestamp>"
+                  },
+                  ...
+                ]
+              }
+            - If the note is not found (HTTP 404 Not Found):
+              {
+                "error": "Note not found"
+              }
+
+    Raises:
+        None
+    """
+
+    note = get_readable_note(request.user, pk)
+    if note is None:
+        return Response({"error": "Note not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    paginator = PageNumberPagination()
+    paginator.page_size = 10
+
+    revisions = NoteRevision.objects.filter(note=note).order_by("-number")
+    revisions_paginated = paginator.paginate_queryset(revisions, request)
+
+    serializer = NoteRevisionSerializer(revisions_paginated, many=True)
+
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(["GET"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def get_note_revision(request, pk, number):
+    """
+    Retrieve a past version of a note owned by or shared with the authenticated user.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object used for retrieving the version.
+        pk (int): The primary key of the note.
+        number (int): The revision number of the version, starting at 1.
+
+    Returns:
+        Response: A JSON response containing the note as it was at that revision.
+            - If the revision is found (HTTP 200 OK):
+              {
+                "number": <revision_number>,
+                "title": "<note_title>",
+                "content": "<note_content>",
+                "timestamp": "<timestamp>"
+              }
+            - If the note or the revision is not found (HTTP 404 Not Found):
+              {
+                "error": "Revision not found"
+              }
+
+    Raises:
+        None
+    """
+
+    note = get_readable_note(request.user, pk)
+    if note is None:
+        return Response(
+            {"error": "Revision not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    revision = NoteRevision.objects.filter(note=note, number=number).first()
+    if revision is None:
+        return Response(
+            {"error": "Revision not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    data = NoteRevisionSerializer(revision).data
+    data["content"] = get_revision_content(note, number)
+    return Response(data, status=status.HTTP_200_OK)
+
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 date or datetime from a query parameter into an aware
+    datetime. Dates mean midnight. Raises ValueError if the value is invalid.
+    """
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(value)
+        parsed = datetime.combine(date, datetime.min.time())
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def get_date_range(request):
+    """
+    Return the ``after`` (inclusive) and ``before`` (exclusive) timestamps of the
+    request's query parameters, each None if not given.
+    """
+
+    after = request.query_params.get("after")
+    before = request.query_params.get("before")
+    return (
+        parse_timestamp(after) if after else None,
+        parse_timestamp(before) if before else None,
+    )
+
+
 @api_view(["GET"])
 @authentication_classes([SessionAuthentication, TokenAuthentication])
 @permission_classes([IsAuthenticated])
@@ -291,6 +629,13 @@ def get_all_created_notes(request):
     Parameters:
         request (HttpRequest): The HTTP request object used for retrieving notes.
 
+    Query Parameters:
+        tag (str): Only notes with this tag.
+        after (str): Only notes created at or after this ISO 8601 date or datetime.
+        before (str): Only notes created before this ISO 8601 date or datetime.
+        shared (str): "true" for only notes shared with someone, "false" for only
+            notes not shared with anyone.
+
     Returns:
         Response: A paginated JSON response containing notes created by the authenticated user.
             - If notes are found and pagination is successful (HTTP 200 OK):
@@ -320,10 +665,56 @@ def get_all_created_notes(request):
         None
     """
 
-    paginator = PageNumberPagination()
-    paginator.page_size = 10
+    try:
+        after, before = get_date_range(request)
+    except ValueError:
+        return Response({"error": "Invalid date"}, status=status.HTTP_400_BAD_REQUEST)
 
-    notes = Note.objects.filter(user=request.user).order_by("-timestamp")
+    tag = request.query_params.get("tag")
+    shared = request.query_params.get("shared")
+    if shared not in (None, "true", "false"):
+        return Response(
+            {"error": "shared must be true or false"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # The lookups go in a single filter() so they all apply to the same tag row.
+    if tag:
+        # Served by the (user, tag, timestamp) index of the tag table, which
+        # needs the tag id rather than a subquery on the name.
+        tag_id = (
+            Tag.objects.filter(user=request.user, name=tag)
+            .values_list("id", flat=True)
+            .first()
+        )
+        lookups = {"note_tags__user": request.user, "note_tags__tag_id": tag_id}
+        timestamp = "note_tags__timestamp"
+    else:
+        lookups = {"user": request.user}
+        timestamp = "timestamp"
+
+    if after:
+        lookups[f"{timestamp}__gte"] = after
+    if before:
+        lookups[f"{timestamp}__lt"] = before
+    if shared == "true":
+        lookups["recipient_count__gt"] = 0
+    elif shared == "false":
+        lookups["recipient_count"] = 0
+
+    if tag and tag_id is None:
+        notes = Note.objects.none()
+    else:
+        notes = Note.objects.filter(**lookups).order_by(f"-{timestamp}")
+
+    if tag or after or before or shared is not None:
+        paginator = PageNumberPagination()
+        paginator.page_size = 10
+    else:
+        stats = UserNoteStats.objects.for_user(request.user)
+        paginator = CountedPageNumberPagination(stats.notes_owned)
+
+    notes = notes.prefetch_related("tags")
 
     notes_paginated = paginator.paginate_queryset(notes, request)
 
@@ -342,6 +733,11 @@ def get_all_shared_notes(request):
     Parameters:
         request (HttpRequest): The HTTP request object used for retrieving shared notes.
 
+    Query Parameters:
+        tag (str): Only notes the owner gave this tag.
+        after (str): Only notes created at or after this ISO 8601 date or datetime.
+        before (str): Only notes created before this ISO 8601 date or datetime.
+
     Returns:
         Response: A paginated JSON response containing notes shared with the authenticated user.
             - If shared notes are found and pagination is successful (HTTP 200 OK):
@@ -371,14 +767,39 @@ def get_all_shared_notes(request):
         None
     """
 
-    paginator = PageNumberPagination()
-    paginator.page_size = 10  # Number of items per page
+    try:
+        after, before = get_date_range(request)
+    except ValueError:
+        return Response({"error": "Invalid date"}, status=status.HTTP_400_BAD_REQUEST)
+
+    tag = request.query_params.get("tag")
 
     # Retrieve notes associated with the authenticated user
-    shared_notes = SharedNote.objects.filter(recipient=request.user).order_by(
-        "-note__timestamp"
-    )
-    notes = [shared_note.note for shared_note in shared_notes]
+    # Filtered and ordered by the share's copy of the timestamp, so the
+    # (recipient, timestamp) index returns the page in order. The lookups go in
+    # a single filter() so they all apply to the same share row.
+    lookups = {"shared_with__recipient": request.user}
+    if tag:
+        # Tags belong to the owners, so no index covers a recipient's tagged
+        # notes: the recipient's shares are walked in order and each note's tags
+        # are checked, and the page count scans all of them.
+        lookups["note_tags__tag__name"] = tag
+    if after:
+        lookups["shared_with__timestamp__gte"] = after
+    if before:
+        lookups["shared_with__timestamp__lt"] = before
+
+    notes = Note.objects.filter(**lookups).order_by("-shared_with__timestamp")
+
+    if tag or after or before:
+        paginator = PageNumberPagination()
+        paginator.page_size = 10
+    else:
+        # The page count comes from the denormalized counter instead of COUNT(*)
+        stats = UserNoteStats.objects.for_user(request.user)
+        paginator = CountedPageNumberPagination(stats.notes_shared_with_me)
+
+    notes = notes.prefetch_related("tags")
 
     # Paginate the queryset
     notes_paginated = paginator.paginate_queryset(notes, request)
@@ -390,6 +811,34 @@ def get_all_shared_notes(request):
     return paginator.get_paginated_response(serializer.data)
 
 
+@api_view(["GET"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def get_tags(request):
+    """
+    Retrieve the names of the tags of the authenticated user.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object used for retrieving tags.
+
+    Returns:
+        Response: A JSON response containing the tag names in alphabetical order.
+            - If the tags are retrieved successfully (HTTP 200 OK):
+              [
+                "<tag_name>",
+                ...
+              ]
+
+    Raises:
+        None
+    """
+
+    tags = Tag.objects.filter(user=request.user).order_by("name")
+    return Response(
+        list(tags.values_list("name", flat=True)), status=status.HTTP_200_OK
+    )
+
+
 @api_view(["POST"])
 @authentication_classes([SessionAuthentication, TokenAuthentication])
 @permission_classes([IsAuthenticated])
@@ -438,7 +887,6 @@ def share_note(request, pk):
 
     try:
         note = Note.objects.get(pk=pk, user=request.user)
-        serializer = NoteSerializer(note)
 
         recipient_email = request.data.get("email")
         recipient_user = User.objects.get(email=recipient_email)
@@ -455,7 +903,12 @@ def share_note(request, pk):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        shared_note = SharedNote.objects.create(note=note, recipient=recipient_user)
+        with transaction.atomic():
+            SharedNote.objects.create(note=note, recipient=recipient_user)
+
+        # The share's signal handler bumped the counter in the database
+        note.refresh_from_db(fields=["recipient_count"])
+        serializer = NoteSerializer(note)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     except Note.DoesNotExist:
@@ -466,3 +919,257 @@ def share_note(request, pk):
         )
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["POST"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def unshare_note(request, pk):
+    """
+    Stop sharing a note with the user specified by their email address.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object used for unsharing the note.
+        pk (int): The primary key of the note to be unshared.
+
+    Request Body:
+        {
+          "email": "<recipient_email>"
+        }
+
+    Returns:
+        Response: A JSON response indicating the result of the unsharing operation.
+            - If the note is successfully unshared (HTTP 200 OK):
+              {
+                "message": "Note unshared successfully"
+              }
+            - If the specified note does not exist (HTTP 404 Not Found):
+              {
+                "error": "Note not found"
+              }
+            - If the recipient user specified by the email does not exist (HTTP 404 Not Found):
+              {
+                "error": "Recipient user not found"
+              }
+            - If the note is not shared with the specified user (HTTP 404 Not Found):
+              {
+                "error": "Note is not shared with this user"
+              }
+
+    Raises:
+        None
+    """
+
+    try:
+        note = Note.objects.get(pk=pk, user=request.user)
+        recipient_user = User.objects.get(email=request.data.get("email"))
+
+        if not SharedNote.objects.revoke(note.id, [recipient_user.id]):
+            return Response(
+                {"error": "Note is not shared with this user"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response(
+            {"message": "Note unshared successfully"}, status=status.HTTP_200_OK
+        )
+
+    except Note.DoesNotExist:
+        return Response({"error": "Note not found"}, status=status.HTTP_404_NOT_FOUND)
+    except User.DoesNotExist:
+        return Response(
+            {"error": "Recipient user not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["POST"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def unshare_note_all(request, pk):
+    """
+    Stop sharing a note with every user it is shared with.
+
+    All shares are removed with a single query, however many recipients the note has.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object used for unsharing the note.
+        pk (int): The primary key of the note to be unshared.
+
+    Returns:
+        Response: A JSON response indicating the result of the unsharing operation.
+            - If the note is successfully unshared (HTTP 200 OK):
+              {
+                "message": "Note unshared from all users",
+                "revoked": <revoked_recipients_count>
+              }
+            - If the specified note does not exist (HTTP 404 Not Found):
+              {
+                "error": "Note not found"
+              }
+
+    Raises:
+        None
+    """
+
+    if not Note.objects.filter(pk=pk, user=request.user).exists():
+        return Response({"error": "Note not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    revoked = SharedNote.objects.revoke(pk)
+    return Response(
+        {"message": "Note unshared from all users", "revoked": revoked},
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def leave_shared_note(request, pk):
+    """
+    Remove a note shared with the authenticated user from their shared notes.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object used for leaving the note.
+        pk (int): The primary key of the shared note to leave.
+
+    Returns:
+        Response: A JSON response indicating the result of the operation.
+            - If the note is successfully left (HTTP 200 OK):
+              {
+                "message": "Shared note removed successfully"
+              }
+            - If the note is not shared with the user (HTTP 404 Not Found):
+              {
+                "error": "Note not found"
+              }
+
+    Raises:
+        None
+    """
+
+    if not SharedNote.objects.revoke(pk, [request.user.id]):
+        return Response({"error": "Note not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(
+        {"message": "Shared note removed successfully"}, status=status.HTTP_200_OK
+    )
+
+
+@api_view(["GET"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def get_note_stats(request):
+    """
+    Retrieve the note counters of the authenticated user.
+
+    The counters are maintained on note and share creation and deletion, so this
+    reads a single row instead of counting the user's notes.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object used for retrieving the counters.
+
+    Returns:
+        Response: A JSON response containing the user's counters.
+            - If the counters are retrieved successfully (HTTP 200 OK):
+              {
+                "notes_owned": <owned_notes_count>,
+                "notes_shared_with_me": <shared_notes_count>
+              }
+
+    Raises:
+        None
+    """
+
+    stats = UserNoteStats.objects.for_user(request.user)
+    return Response(
+        {
+            "notes_owned": stats.notes_owned,
+            "notes_shared_with_me": stats.notes_shared_with_me,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAdminUser])
+def list_request_profiles(request):
+    """
+    List the slow request profiles kept in the on-disk ring buffer, newest first.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object of a staff user.
+
+    Returns:
+        Response: A JSON response containing a summary of each stored profile.
+            - If the profiles are listed successfully (HTTP 200 OK):
+              [
+                {
+                  "name": "<profile_name>",
+                  "method": "<http_method>",
+                  "path": "<request_path>",
+                  "status": <response_status>,
+                  "duration_ms": <duration>,
+                  "query_count": <query_count>,
+                  "reason": "slow" | "sampled",
+                  "created": <unix_timestamp>
+                },
+                ...
+              ]
+
+    Raises:
+        None
+    """
+
+    # Imported here so that the API-only profile, which leaves out the profiler
+    # middleware, does not load cProfile and pstats at startup.
+    from . import profiling
+
+    return Response(profiling.list_profiles(), status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([IsAdminUser])
+def get_request_profile(request, name):
+    """
+    Retrieve a single slow request profile including its SQL statements and cProfile output.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object of a staff user.
+        name (str): The name of the profile, as returned by the profile list.
+
+    Returns:
+        Response: A JSON response containing the stored profile.
+            - If the profile exists (HTTP 200 OK):
+              {
+                "method": "<http_method>",
+                "path": "<request_path>",
+                "user": <user_id>,
+                "status": <response_status>,
+                "duration_ms": <duration>,
+                "reason": "slow" | "sampled",
+                "created": <unix_timestamp>,
+                "queries": [{"sql": "<sql>", "duration_ms": <duration>}, ...],
+                "profile": "<pstats_output>"
+              }
+            - If the profile does not exist or has been rotated out (HTTP 404 Not Found):
+              {
+                "error": "Profile not found"
+              }
+
+    Raises:
+        None
+    """
+
+    from . import profiling
+
+    record = profiling.load_profile(name)
+    if record is None:
+        return Response(
+            {"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    return Response(record, status=status.HTTP_200_OK)
@@ -50,6 +50,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "notes.profiling.SlowRequestProfilerMiddleware",
 ]
 
 ROOT_URLCONF = "notesapi.urls"
@@ -124,3 +125,40 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Slow request profiler
+# Requests slower than the threshold, plus a random sample of the rest, are
+# profiled and kept in a bounded ring buffer under SLOW_REQUEST_PROFILE_DIR.
+
+SLOW_REQUEST_PROFILER_ENABLED = False
+
+SLOW_REQUEST_THRESHOLD_MS = 1000
+
+SLOW_REQUEST_SAMPLE_RATE = 0.0
+
+SLOW_REQUEST_PROFILE_DIR = BASE_DIR / "profiles"
+
+SLOW_REQUEST_PROFILE_LIMIT = 50
+
+SLOW_REQUEST_PROFILE_QUERY_LIMIT = 200
+
+SLOW_REQUEST_PROFILE_STATS_LINES = 40
+
+
+# Batched deletion
+# Number of rows removed per statement by the run_deletion_jobs command, and the
+# seconds after which a running job is assumed to have lost its worker and is
+# picked up again.
+
+DELETION_BATCH_SIZE = 1000
+
+DELETION_JOB_LEASE = 3600
+
+
+# Note revisions
+# The latest and every REVISION_SNAPSHOT_INTERVAL-th revision store the full
+# content, the others store a delta, so rebuilding a version applies at most
+# this many.
+
+REVISION_SNAPSHOT_INTERVAL = 20
@@ -0,0 +1,39 @@
+"""
+API-only settings for notesapi.
+
+Loads only what the token-authenticated endpoints in the notes app need, for
+short-lived workers where cold start matters. The admin, sessions, messages,
+static files, templates and the browsable API are left out.
+
+Use it through notesapi.wsgi_api, or by setting
+DJANGO_SETTINGS_MODULE=notesapi.settings_api.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "rest_framework",
+    "rest_framework.authtoken",
+    "notes",
+]
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+# Only add the profiler when it is switched on, so its imports are skipped.
+if SLOW_REQUEST_PROFILER_ENABLED:  # noqa: F405
+    MIDDLEWARE.append("notes.profiling.SlowRequestProfilerMiddleware")
+
+ROOT_URLCONF = "notesapi.urls_api"
+
+WSGI_APPLICATION = "notesapi.wsgi_api.application"
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
+}
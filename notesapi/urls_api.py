@@ -0,0 +1,11 @@
+"""notesapi URL Configuration for the API-only settings
+
+Same routes as notesapi.urls without the admin site.
+"""
+
+from django.urls import path, include
+
+
+urlpatterns = [
+    path("api/", include("notes.urls")),
+]
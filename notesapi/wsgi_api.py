@@ -0,0 +1,18 @@
+"""
+WSGI config for the API-only profile of the notesapi project.
+
+It exposes the WSGI callable as a module-level variable named ``application``,
+using notesapi.settings_api, which skips the admin, sessions, messages and
+static files.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.0/howto/deployment/wsgi/
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'notesapi.settings_api')
+
+application = get_wsgi_application()